@@ -13,9 +13,23 @@ Computes derived metrics:
 
 import pandas as pd
 import numpy as np
-import json
+import orjson
+import gc
+import os
+from multiprocessing import Pool
 from pathlib import Path
 from math import sqrt
+from pandas.api.types import union_categoricals
+
+from tracking_io import (INPUT_COLUMNS, OUTPUT_COLUMNS, atomic_output, read_tracking,
+                         split_player_frames, write_gzip_copy)
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; without it the distance kernel runs as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
 
 # Paths
 BASE_DIR = Path(__file__).parent.parent
@@ -23,6 +37,38 @@ BDB_DIR = BASE_DIR / "nfl-big-data-bowl-2026-prediction" / "train"
 NFLVERSE_FILE = BASE_DIR / "data" / "play_by_play_2023.csv"
 OUTPUT_FILE = BASE_DIR / "public" / "plays_filtered.json"
 
+# Per-row tracking columns kept for building play frames
+FRAME_COLUMNS = ['game_id', 'play_id', 'nfl_id', 'frame_id', 'x', 'y', 's']
+
+# nflverse columns copied onto each play, and the play field each one fills
+NFLVERSE_FIELDS = {
+    'down': 'down',
+    'ydstogo': 'yardsToGo',
+    'play_type': 'playType',
+    'yards_gained': 'yardsGained',
+    'shotgun': 'shotgun',
+    'pass_length': 'passLength',
+    'pass_location': 'passLocation',
+    'posteam': 'offense',
+    'defteam': 'defense',
+    'qtr': 'quarter',
+    'desc': 'description',
+}
+
+def concat_weeks(dfs):
+    """
+    Concatenate per-week tracking frames. Each week's categoricals only hold
+    the values seen that week, so they're widened to the union first; otherwise
+    pd.concat falls back to plain strings.
+    """
+    if not dfs:
+        return pd.DataFrame()
+    for col in dfs[0].select_dtypes('category').columns:
+        categories = union_categoricals([df[col] for df in dfs]).categories
+        for df in dfs:
+            df[col] = df[col].cat.set_categories(categories)
+    return pd.concat(dfs, ignore_index=True)
+
 def load_bdb_data(weeks=range(1, 10)):
     """Load BDB input + output tracking data for specified weeks."""
     input_dfs = []
@@ -33,7 +79,7 @@ def load_bdb_data(weeks=range(1, 10)):
         input_file = BDB_DIR / f"input_2023_w{week:02d}.csv"
         if input_file.exists():
             print(f"Loading week {week} input...")
-            df = pd.read_csv(input_file)
+            df = read_tracking(input_file, INPUT_COLUMNS)
             df['week'] = week
             input_dfs.append(df)
 
@@ -41,12 +87,12 @@ def load_bdb_data(weeks=range(1, 10)):
         output_file = BDB_DIR / f"output_2023_w{week:02d}.csv"
         if output_file.exists():
             print(f"Loading week {week} output...")
-            df = pd.read_csv(output_file)
+            df = read_tracking(output_file, OUTPUT_COLUMNS)
             df['week'] = week
             output_dfs.append(df)
 
-    input_df = pd.concat(input_dfs, ignore_index=True) if input_dfs else pd.DataFrame()
-    output_df = pd.concat(output_dfs, ignore_index=True) if output_dfs else pd.DataFrame()
+    input_df = concat_weeks(input_dfs)
+    output_df = concat_weeks(output_dfs)
 
     return input_df, output_df
 
@@ -56,52 +102,71 @@ def load_nflverse_data():
     cols = ['old_game_id', 'play_id', 'down', 'ydstogo', 'yardline_100',
             'play_type', 'yards_gained', 'shotgun', 'pass_length',
             'pass_location', 'posteam', 'defteam', 'qtr', 'desc']
-    df = pd.read_csv(NFLVERSE_FILE, usecols=cols)
+    df = pd.read_csv(NFLVERSE_FILE, usecols=cols, engine='pyarrow')
     df = df.rename(columns={'old_game_id': 'game_id'})
+
+    # Fill defaults and fix types once so rows can be copied onto plays as-is
+    df = df.fillna({'down': 0, 'ydstogo': 0, 'yards_gained': 0, 'qtr': 1, 'shotgun': False,
+                    'play_type': 'unknown', 'posteam': 'UNK', 'defteam': 'UNK', 'desc': ''})
+    df = df.astype({'down': 'int8', 'ydstogo': 'int8', 'yards_gained': 'int16', 'qtr': 'int8',
+                    'shotgun': 'bool'})
+    for col in ['pass_length', 'pass_location']:
+        df[col] = df[col].astype(object).where(df[col].notna(), None)
     return df
 
-def compute_coverage_tightness(play_df):
+# fastmath without 'ninf'/'nnan', so the inf sentinel (and any NaN input)
+# keeps its IEEE meaning
+@njit(fastmath={'contract', 'reassoc'}, cache=True)
+def min_distance(xs, ys, target_x, target_y):
+    """Distance from the target to the nearest point, in one fused pass."""
+    best = np.inf
+    for i in range(xs.shape[0]):
+        d = (xs[i] - target_x) ** 2 + (ys[i] - target_y) ** 2
+        if d < best:
+            best = d
+    return sqrt(best)
+
+def category_mask(col, value):
+    """Boolean mask of col == value, compared on the categorical's integer codes."""
+    if not isinstance(col.dtype, pd.CategoricalDtype):
+        return (col == value).to_numpy()
+    if value not in col.cat.categories:
+        return np.zeros(len(col), dtype=bool)
+    return col.cat.codes.to_numpy() == col.cat.categories.get_loc(value)
+
+def nearest_defender_distance(frame_ids, xs, ys, is_target, is_defense, frame):
     """
-    Compute min distance between target receiver and nearest DB at frame 1 (snap).
-    Returns None if can't compute.
+    Min distance between the targeted receiver and the nearest defender at a frame.
+    Operates on per-play column arrays. Returns None if can't compute.
     """
-    snap_frame = play_df[play_df['frame_id'] == 1]
+    at_frame = frame_ids == frame
 
     # Find target receiver
-    target = snap_frame[snap_frame['player_role'] == 'Targeted Receiver']
-    if target.empty:
+    target = at_frame & is_target
+    if not target.any():
         return None
-    target_x = target['x'].values[0]
-    target_y = target['y'].values[0]
+    target_x = xs[target][0]
+    target_y = ys[target][0]
 
     # Find defensive backs
-    dbs = snap_frame[snap_frame['player_side'] == 'Defense']
-    if dbs.empty:
+    dbs = at_frame & is_defense
+    if not dbs.any():
         return None
 
-    # Compute min distance
-    distances = np.sqrt((dbs['x'] - target_x)**2 + (dbs['y'] - target_y)**2)
-    return float(distances.min())
+    return min_distance(xs[dbs], ys[dbs], target_x, target_y)
 
-def compute_separation_at_target(play_df):
+def compute_coverage_tightness(frame_ids, xs, ys, is_target, is_defense):
     """
-    Compute separation between receiver and nearest DB at the last tracked frame.
+    Compute min distance between target receiver and nearest DB at frame 1 (snap).
+    Returns None if can't compute.
     """
-    max_frame = play_df['frame_id'].max()
-    last_frame = play_df[play_df['frame_id'] == max_frame]
+    return nearest_defender_distance(frame_ids, xs, ys, is_target, is_defense, 1)
 
-    target = last_frame[last_frame['player_role'] == 'Targeted Receiver']
-    if target.empty:
-        return None
-    target_x = target['x'].values[0]
-    target_y = target['y'].values[0]
-
-    dbs = last_frame[last_frame['player_side'] == 'Defense']
-    if dbs.empty:
-        return None
-
-    distances = np.sqrt((dbs['x'] - target_x)**2 + (dbs['y'] - target_y)**2)
-    return float(distances.min())
+def compute_separation_at_target(frame_ids, xs, ys, is_target, is_defense, last_frame):
+    """
+    Compute separation between receiver and nearest DB at the last tracked frame.
+    """
+    return nearest_defender_distance(frame_ids, xs, ys, is_target, is_defense, last_frame)
 
 def get_field_zone(yardline):
     """Categorize field position."""
@@ -114,196 +179,281 @@ def get_field_zone(yardline):
     else:
         return 'own_territory'
 
-def build_play_data(input_df, output_df, nfl_df):
-    """Build the final play dataset with combined input + output frames."""
-    plays = []
+def build_play(task):
+    """Build a single play with combined input + output frames."""
+    key, frames, player_meta, first_row, max_input_frame, max_output_frame, nfl_row = task
+    game_id, play_id = key
+
+    # Compute metrics from input (pre-throw) data. Output rows are never
+    # flagged, and their offset frame ids can't match the snap or last input frame
+    metric_arrays = (frames['frame_id'], frames['x'], frames['y'], frames['is_target'], frames['is_defense'])
+    coverage_tightness = compute_coverage_tightness(*metric_arrays)
+    separation = compute_separation_at_target(*metric_arrays, max_input_frame)
+
+    # Build player frames - the play's rows are already sorted by (player, frame),
+    # with output frames offset past the last input frame, so split them into
+    # per-player runs at id boundaries
+    player_frames = split_player_frames(
+        frames['nfl_id'],
+        {'f': frames['frame_id'], 'x': frames['x'], 'y': frames['y'], 's': frames['s']},
+        {'x': 1, 'y': 1, 's': 1},
+    )
+
+    players = []
+    for player_frame_columns, player in zip(player_frames, player_meta):
+        players.append({
+            'nflId': player['nfl_id'],
+            'name': player['player_name'],
+            'position': player['player_position'],
+            'side': player['player_side'],
+            'role': player['player_role'],
+            'team': 'away' if player['player_side'] == 'Offense' else 'home',
+            # Frames are stored column-wise, one list per field, indexed by position
+            'frames': player_frame_columns,
+        })
+
+    # Calculate total frames (input + output)
+    total_frames = max_input_frame + max_output_frame
+
+    # Build play object
+    play_obj = {
+        'gameId': game_id,
+        'playId': play_id,
+        'direction': first_row['play_direction'],
+        'yardline': first_row['absolute_yardline_number'],
+        'ballLandX': first_row['ball_land_x'] if pd.notna(first_row['ball_land_x']) else None,
+        'ballLandY': first_row['ball_land_y'] if pd.notna(first_row['ball_land_y']) else None,
+        'numFrames': total_frames,
+        'numInputFrames': max_input_frame,
+        'numOutputFrames': max_output_frame,
+        'players': players,
+        # Computed metrics for filtering
+        'coverageTightness': round(coverage_tightness, 1) if coverage_tightness else None,
+        'separation': round(separation, 1) if separation else None,
+        'fieldZone': get_field_zone(first_row['absolute_yardline_number']),
+    }
 
-    # Group input by game and play
-    input_grouped = input_df.groupby(['game_id', 'play_id'])
-
-    # Create lookup for output frames
-    output_grouped = output_df.groupby(['game_id', 'play_id']) if not output_df.empty else {}
-
-    total = len(input_grouped)
-
-    for i, ((game_id, play_id), input_play_df) in enumerate(input_grouped):
-        if i % 500 == 0:
-            print(f"Processing play {i}/{total}...")
-
-        # Get nflverse metadata
-        nfl_play = nfl_df[(nfl_df['game_id'] == game_id) & (nfl_df['play_id'] == play_id)]
-
-        # Get first row for play-level info
-        first_row = input_play_df.iloc[0]
-
-        # Compute metrics from input (pre-throw) data
-        coverage_tightness = compute_coverage_tightness(input_play_df)
-        separation = compute_separation_at_target(input_play_df)
-
-        # Get max input frame to offset output frames
-        max_input_frame = input_play_df['frame_id'].max()
-
-        # Get output frames if available
-        try:
-            output_play_df = output_grouped.get_group((game_id, play_id))
-            has_output = True
-        except (KeyError, AttributeError):
-            output_play_df = pd.DataFrame()
-            has_output = False
-
-        # Build player frames - combining input + output
-        players = []
-        for nfl_id, player_input_df in input_play_df.groupby('nfl_id'):
-            player_input_df = player_input_df.sort_values('frame_id')
-            first_player = player_input_df.iloc[0]
-
-            frames = []
-
-            # Add input frames
-            for _, row in player_input_df.iterrows():
-                frames.append({
-                    'f': int(row['frame_id']),
-                    'x': round(float(row['x']), 1),
-                    'y': round(float(row['y']), 1),
-                    's': round(float(row['s']), 1) if pd.notna(row.get('s', None)) else 0,
-                })
-
-            # Add output frames (offset by max input frame)
-            if has_output and nfl_id in output_play_df['nfl_id'].values:
-                player_output_df = output_play_df[output_play_df['nfl_id'] == nfl_id].sort_values('frame_id')
-                for _, row in player_output_df.iterrows():
-                    frames.append({
-                        'f': int(row['frame_id']) + max_input_frame,  # Offset!
-                        'x': round(float(row['x']), 1),
-                        'y': round(float(row['y']), 1),
-                        's': 0,  # Output doesn't have speed
-                    })
-
-            players.append({
-                'nflId': int(nfl_id),
-                'name': first_player['player_name'],
-                'position': first_player['player_position'],
-                'side': first_player['player_side'],
-                'role': first_player['player_role'],
-                'team': 'away' if first_player['player_side'] == 'Offense' else 'home',
-                'frames': frames
-            })
-
-        # Calculate total frames (input + output)
-        max_output_frame = output_play_df['frame_id'].max() if has_output and not output_play_df.empty else 0
-        total_frames = max_input_frame + max_output_frame
-
-        # Build play object
-        play_obj = {
-            'gameId': int(game_id),
-            'playId': int(play_id),
-            'direction': first_row['play_direction'],
-            'yardline': int(first_row['absolute_yardline_number']),
-            'ballLandX': float(first_row['ball_land_x']) if pd.notna(first_row['ball_land_x']) else None,
-            'ballLandY': float(first_row['ball_land_y']) if pd.notna(first_row['ball_land_y']) else None,
-            'numFrames': int(total_frames),
-            'numInputFrames': int(max_input_frame),
-            'numOutputFrames': int(max_output_frame) if has_output else 0,
-            'players': players,
-            # Computed metrics for filtering
-            'coverageTightness': round(coverage_tightness, 1) if coverage_tightness else None,
-            'separation': round(separation, 1) if separation else None,
-            'fieldZone': get_field_zone(first_row['absolute_yardline_number']),
-        }
+    # Add nflverse metadata if found
+    if nfl_row is not None:
+        play_obj.update(nfl_row)
 
-        # Add nflverse metadata if found
-        if not nfl_play.empty:
-            nfl_row = nfl_play.iloc[0]
-            play_obj['down'] = int(nfl_row['down']) if pd.notna(nfl_row['down']) else 0
-            play_obj['yardsToGo'] = int(nfl_row['ydstogo']) if pd.notna(nfl_row['ydstogo']) else 0
-            play_obj['playType'] = nfl_row['play_type'] if pd.notna(nfl_row['play_type']) else 'unknown'
-            play_obj['yardsGained'] = int(nfl_row['yards_gained']) if pd.notna(nfl_row['yards_gained']) else 0
-            play_obj['shotgun'] = bool(nfl_row['shotgun']) if pd.notna(nfl_row['shotgun']) else False
-            play_obj['passLength'] = nfl_row['pass_length'] if pd.notna(nfl_row['pass_length']) else None
-            play_obj['passLocation'] = nfl_row['pass_location'] if pd.notna(nfl_row['pass_location']) else None
-            play_obj['offense'] = nfl_row['posteam'] if pd.notna(nfl_row['posteam']) else 'UNK'
-            play_obj['defense'] = nfl_row['defteam'] if pd.notna(nfl_row['defteam']) else 'UNK'
-            play_obj['quarter'] = int(nfl_row['qtr']) if pd.notna(nfl_row['qtr']) else 1
-            play_obj['description'] = nfl_row['desc'] if pd.notna(nfl_row['desc']) else ''
-
-        plays.append(play_obj)
-
-    return plays
+    return play_obj
+
+def encode_play(task):
+    """Build and encode a play in a worker; return the bytes plus a frame-less summary."""
+    play_obj = build_play(task)
+    play_bytes = orjson.dumps(play_obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    del play_obj['players']
+    return play_bytes, play_obj
+
+def prepare_play_data(weeks):
+    """
+    Load the tracking and nflverse data and reduce it to per-row frame arrays
+    and per-play lookups, dropping each source table once its arrays exist.
+    """
+    keys = ['game_id', 'play_id']
+    input_df, output_df = load_bdb_data(weeks)
+
+    print(f"Input plays: {input_df.groupby(keys).ngroups}")
+    print(f"Output plays: {output_df.groupby(keys).ngroups if not output_df.empty else 0}")
+
+    # Play-level fields from each play's first input row, and each player's
+    # metadata in (game_id, play_id, nfl_id) order - the order frames are split in
+    info_cols = ['play_direction', 'absolute_yardline_number', 'ball_land_x', 'ball_land_y']
+    first_rows = input_df.drop_duplicates(keys)
+    play_info = dict(zip(zip(first_rows['game_id'].tolist(), first_rows['play_id'].tolist()),
+                         first_rows[info_cols].to_dict('records')))
+    players = input_df.drop_duplicates(keys + ['nfl_id']).sort_values(keys + ['nfl_id'])
+    player_meta = {}
+    meta_cols = ['nfl_id', 'player_name', 'player_position', 'player_side', 'player_role']
+    for key, meta in zip(zip(players['game_id'].tolist(), players['play_id'].tolist()),
+                         players[meta_cols].to_dict('records')):
+        player_meta.setdefault(key, []).append(meta)
+    players = players[keys + ['nfl_id']]
+
+    # Per-row columns the play builder reads, plus the metric kernels' masks
+    max_input = input_df.groupby(keys)['frame_id'].max().rename('max_input_frame')
+    input_max = max_input.to_dict()
+    columns = {col: [input_df[col].to_numpy()] for col in FRAME_COLUMNS}
+    columns['is_target'] = [category_mask(input_df['player_role'], 'Targeted Receiver')]
+    columns['is_defense'] = [category_mask(input_df['player_side'], 'Defense')]
+    del input_df
+    gc.collect()
+
+    # Output frames go after the input frames, offset past each play's last
+    # input frame, so a player's whole track comes out of one sort.
+    # Output rows for players not tracked in the input are dropped, as before
+    output_max = {}
+    if not output_df.empty:
+        output_max = output_df.groupby(keys)['frame_id'].max().to_dict()
+        output_frames = output_df.merge(players, on=keys + ['nfl_id']).join(max_input, on=keys)
+        del output_df
+        output_frames['frame_id'] += output_frames['max_input_frame']
+        output_frames['s'] = np.nan  # Output doesn't have speed
+        for col in FRAME_COLUMNS:
+            columns[col].append(output_frames[col].to_numpy())
+        no_flag = np.zeros(len(output_frames), dtype=bool)
+        columns['is_target'].append(no_flag)
+        columns['is_defense'].append(no_flag)
+        del output_frames
+        gc.collect()
+
+    # Sort every row once by (game, play, player, frame) and find where each
+    # play's run of rows starts and ends
+    columns = {col: np.concatenate(parts) for col, parts in columns.items()}
+    order = np.lexsort((columns['frame_id'], columns['nfl_id'], columns['play_id'], columns['game_id']))
+    columns = {col: arr[order] for col, arr in columns.items()}
+    game_ids = columns.pop('game_id')
+    play_ids = columns.pop('play_id')
+    bounds = np.flatnonzero((np.diff(game_ids) != 0) | (np.diff(play_ids) != 0)) + 1
+    starts = np.concatenate(([0], bounds)) if len(game_ids) else bounds
+    play_keys = list(zip(game_ids[starts].tolist(), play_ids[starts].tolist()))
+    ends = [*bounds.tolist(), len(game_ids)]
+    del game_ids, play_ids
+
+    # Index nflverse metadata by (game_id, play_id) for O(1) lookups, keyed
+    # by the play fields they fill in. The season-wide table is first cut down
+    # to tracked plays, matched on packed (game_id << 32 | play_id) int64 keys
+    nfl_df = load_nflverse_data()
+    print(f"nflverse plays: {len(nfl_df)}")
+    tracked = np.array(play_keys, dtype=np.int64).reshape(-1, 2)
+    nfl_keys = (nfl_df['game_id'].to_numpy(np.int64) << 32) | nfl_df['play_id'].to_numpy(np.int64)
+    nfl_tracked = nfl_df[np.isin(nfl_keys, (tracked[:, 0] << 32) | tracked[:, 1])]
+    del nfl_df
+    nfl_lookup = (nfl_tracked.drop_duplicates(keys)
+                  .set_index(keys)
+                  .rename(columns=NFLVERSE_FIELDS)[list(NFLVERSE_FIELDS.values())]
+                  .to_dict(orient='index'))
+
+    return {
+        'keys': play_keys,
+        'starts': starts.tolist(),
+        'ends': ends,
+        'columns': columns,
+        'player_meta': player_meta,
+        'play_info': play_info,
+        'input_max': input_max,
+        'output_max': output_max,
+        'nfl_lookup': nfl_lookup,
+    }
+
+def play_tasks(play_data):
+    """Yield one build_play task per play: its key, lookups and frame-array slices."""
+    columns = play_data['columns']
+    for key, start, end in zip(play_data['keys'], play_data['starts'], play_data['ends']):
+        yield (
+            key,
+            {col: arr[start:end] for col, arr in columns.items()},
+            play_data['player_meta'][key],
+            play_data['play_info'][key],
+            play_data['input_max'][key],
+            play_data['output_max'].get(key, 0),
+            play_data['nfl_lookup'].get(key),
+        )
+
+def build_play_data(play_data):
+    """
+    Build plays across a process pool, yielding (encoded play, summary) pairs
+    in (game_id, play_id) order as they complete.
+    """
+    total = len(play_data['keys'])
+
+    # Plays share no state, so each task carries only its own play's array
+    # slices and lookups; workers return already-encoded bytes
+    with Pool(processes=os.cpu_count()) as pool:
+        for i, result in enumerate(pool.imap(encode_play, play_tasks(play_data), chunksize=8)):
+            if i % 500 == 0:
+                print(f"Processing play {i}/{total}...")
+            yield result
 
 def compute_tendencies(plays):
     """Compute aggregate tendencies from plays."""
     if not plays:
         return {}
 
-    # Group by offense team
-    teams = {}
-    for play in plays:
-        team = play.get('offense', 'UNK')
-        if team not in teams:
-            teams[team] = []
-        teams[team].append(play)
+    # One columnar frame of the fields we aggregate; plays without nflverse
+    # metadata count under 'UNK' with 0 yards
+    plays_df = pd.DataFrame(plays).reindex(columns=['offense', 'playType', 'yardsGained', 'coverageTightness'])
+    plays_df['offense'] = plays_df['offense'].fillna('UNK')
+    plays_df['yardsGained'] = plays_df['yardsGained'].fillna(0)
+    plays_df['is_pass'] = plays_df['playType'] == 'pass'
+    plays_df['is_run'] = plays_df['playType'] == 'run'
+
+    # Only plays with a (nonzero) coverage measurement count toward avgCoverage
+    coverage = plays_df['coverageTightness'].astype(float)
+    plays_df['coverageTightness'] = coverage.where(coverage != 0)
+
+    # Group by offense team, in order of first appearance
+    agg = plays_df.groupby('offense', sort=False).agg(
+        totalPlays=('offense', 'size'),
+        passRate=('is_pass', 'mean'),
+        runRate=('is_run', 'mean'),
+        avgYards=('yardsGained', 'mean'),
+        avgCoverage=('coverageTightness', 'mean'),
+    )
+    agg = agg[agg['totalPlays'] >= 10]
 
     tendencies = {}
-    for team, team_plays in teams.items():
-        if len(team_plays) < 10:
-            continue
-
-        pass_plays = [p for p in team_plays if p.get('playType') == 'pass']
-        run_plays = [p for p in team_plays if p.get('playType') == 'run']
-
+    for team, row in agg.iterrows():
         tendencies[team] = {
-            'totalPlays': len(team_plays),
+            'totalPlays': int(row['totalPlays']),
             'overall': {
-                'passRate': len(pass_plays) / len(team_plays) if team_plays else 0,
-                'runRate': len(run_plays) / len(team_plays) if team_plays else 0,
-                'avgYards': sum(p.get('yardsGained', 0) for p in team_plays) / len(team_plays),
-                'avgCoverage': sum(p.get('coverageTightness', 0) or 0 for p in team_plays if p.get('coverageTightness')) / max(1, len([p for p in team_plays if p.get('coverageTightness')])),
+                'passRate': float(row['passRate']),
+                'runRate': float(row['runRate']),
+                'avgYards': float(row['avgYards']),
+                'avgCoverage': float(row['avgCoverage']) if pd.notna(row['avgCoverage']) else 0,
             }
         }
 
     return tendencies
 
 def main():
-    # Load data - both input and output
-    input_df, output_df = load_bdb_data(weeks=range(1, 6))  # First 5 weeks
-    nfl_df = load_nflverse_data()
-
-    print(f"Input plays: {input_df.groupby(['game_id', 'play_id']).ngroups}")
-    print(f"Output plays: {output_df.groupby(['game_id', 'play_id']).ngroups if not output_df.empty else 0}")
-    print(f"nflverse plays: {len(nfl_df)}")
-
-    # Build plays with combined input + output frames
-    plays = build_play_data(input_df, output_df, nfl_df)
-    print(f"Built {len(plays)} plays with tracking data")
-
-    # Show sample frame counts
-    if plays:
-        sample = plays[0]
-        print(f"Sample play: {sample['numInputFrames']} input + {sample['numOutputFrames']} output = {sample['numFrames']} total frames")
-
-    # Compute tendencies
-    tendencies = compute_tendencies(plays)
-
-    # Output
-    output = {
-        'plays': plays,
-        'tendencies': tendencies,
-        'filters': {
-            'coverageTightness': {'tight': 3, 'normal': 5, 'loose': 7},
-            'fieldZone': ['redzone', 'midfield', 'own_territory'],
-            'down': [1, 2, 3, 4],
-        }
+    # Load data - both input and output - reduced to the arrays and lookups
+    # the play builder needs
+    play_data = prepare_play_data(weeks=range(1, 6))  # First 5 weeks
+
+    filters = {
+        'coverageTightness': {'tight': 3, 'normal': 5, 'loose': 7},
+        'fieldZone': ['redzone', 'midfield', 'own_territory'],
+        'down': [1, 2, 3, 4],
     }
 
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(output, f)
+    # Build plays with combined input + output frames, streaming each one to
+    # disk as it's built and keeping only the frame-less summary for tendencies.
+    # The output file is only replaced once the whole document is written
+    plays = []
+    with atomic_output(OUTPUT_FILE) as f:
+        f.write(b'{"plays":[')
+        for i, (play_bytes, play) in enumerate(build_play_data(play_data)):
+            if i:
+                f.write(b',')
+            f.write(play_bytes)
+            plays.append(play)
+        print(f"Built {len(plays)} plays with tracking data")
+
+        # Show sample frame counts
+        if plays:
+            sample = plays[0]
+            print(f"Sample play: {sample['numInputFrames']} input + {sample['numOutputFrames']} output = {sample['numFrames']} total frames")
+
+        # Compute tendencies
+        tendencies = compute_tendencies(plays)
+
+        f.write(b'],"tendencies":')
+        f.write(orjson.dumps(tendencies, option=orjson.OPT_SERIALIZE_NUMPY))
+        f.write(b',"filters":')
+        f.write(orjson.dumps(filters))
+        f.write(b'}')
 
     print(f"Wrote {OUTPUT_FILE} ({OUTPUT_FILE.stat().st_size / 1024 / 1024:.1f} MB)")
 
-    # Also write tendencies separately for quick loading
+    # Pre-compressed copy for static serving with Content-Encoding: gzip
+    gz_file = write_gzip_copy(OUTPUT_FILE)
+    print(f"Wrote {gz_file} ({gz_file.stat().st_size / 1024 / 1024:.1f} MB)")
+
+    # Also write tendencies separately for quick loading (compact, not meant for reading)
     tend_file = BASE_DIR / "public" / "tendencies_2023.json"
-    with open(tend_file, 'w') as f:
-        json.dump(tendencies, f, indent=2)
+    tend_file.write_bytes(orjson.dumps(tendencies, option=orjson.OPT_SERIALIZE_NUMPY))
     print(f"Wrote {tend_file}")
 
 if __name__ == "__main__":
@@ -5,53 +5,81 @@ Extracts KC and PHI plays and computes pass/run tendencies.
 """
 
 import pandas as pd
-import json
+import orjson
 from pathlib import Path
 
 DATA_FILE = Path(__file__).parent.parent / "data" / "play_by_play_2025.csv"
 OUTPUT_FILE = Path(__file__).parent.parent / "public" / "tendencies.json"
 
-def compute_tendencies(plays):
-    """Compute tendency stats from a set of plays."""
-    total = len(plays)
-    if total == 0:
-        return None
-
-    pass_plays = plays[plays['play_type'] == 'pass']
-    run_plays = plays[plays['play_type'] == 'run']
-
-    pass_count = len(pass_plays)
-    run_count = len(run_plays)
-    pass_run_total = pass_count + run_count
-
-    if pass_run_total == 0:
-        return None
-
-    # Pass location breakdown
-    pass_left = len(pass_plays[pass_plays['pass_location'] == 'left'])
-    pass_mid = len(pass_plays[pass_plays['pass_location'] == 'middle'])
-    pass_right = len(pass_plays[pass_plays['pass_location'] == 'right'])
-
-    # Shotgun usage
-    shotgun_plays = plays[plays['shotgun'] == 1]
-
-    # Yards gained
-    avg_yards = plays['yards_gained'].mean()
-    pass_avg_yards = pass_plays['yards_gained'].mean() if len(pass_plays) > 0 else 0
-    run_avg_yards = run_plays['yards_gained'].mean() if len(run_plays) > 0 else 0
-
-    return {
-        'sampleSize': int(pass_run_total),
-        'passRate': round(pass_count / pass_run_total, 3),
-        'runRate': round(run_count / pass_run_total, 3),
-        'passLeft': round(pass_left / pass_count, 3) if pass_count > 0 else 0,
-        'passMiddle': round(pass_mid / pass_count, 3) if pass_count > 0 else 0,
-        'passRight': round(pass_right / pass_count, 3) if pass_count > 0 else 0,
-        'shotgunRate': round(len(shotgun_plays) / pass_run_total, 3),
-        'avgYards': round(avg_yards, 1) if pd.notna(avg_yards) else 0,
-        'passAvgYards': round(pass_avg_yards, 1) if pd.notna(pass_avg_yards) else 0,
-        'runAvgYards': round(run_avg_yards, 1) if pd.notna(run_avg_yards) else 0,
-    }
+def add_tendency_columns(df):
+    """Add the per-play flags and bucket columns the tendency aggregations use."""
+    df = df.copy()
+    is_pass = df['play_type'] == 'pass'
+    is_run = df['play_type'] == 'run'
+
+    df['is_pass'] = is_pass
+    df['is_run'] = is_run
+    df['pass_left'] = is_pass & (df['pass_location'] == 'left')
+    df['pass_middle'] = is_pass & (df['pass_location'] == 'middle')
+    df['pass_right'] = is_pass & (df['pass_location'] == 'right')
+    df['is_shotgun'] = df['shotgun'] == 1
+    df['pass_yards'] = df['yards_gained'].where(is_pass)
+    df['run_yards'] = df['yards_gained'].where(is_run)
+
+    # Distance buckets (short: 1-3, medium: 4-7, long: 8+)
+    df['distance_bucket'] = pd.cut(df['ydstogo'], [0, 3, 7, float('inf')],
+                                   labels=['short', 'medium', 'long'])
+
+    # Formation buckets (shotgun vs under center)
+    df['formation_bucket'] = df['shotgun'].map({1: 'shotgun', 0: 'underCenter'})
+
+    return df
+
+def compute_tendencies(plays, by):
+    """
+    Compute tendency stats for every group of `by` in a single groupby pass.
+    Returns {group key: stats}; groups with no pass/run plays are left out.
+    """
+    agg = plays.groupby(by, observed=True).agg(
+        total=('play_type', 'size'),
+        pass_count=('is_pass', 'sum'),
+        run_count=('is_run', 'sum'),
+        pass_left=('pass_left', 'sum'),
+        pass_mid=('pass_middle', 'sum'),
+        pass_right=('pass_right', 'sum'),
+        shotgun=('is_shotgun', 'sum'),
+        avg_yards=('yards_gained', 'mean'),
+        pass_avg_yards=('pass_yards', 'mean'),
+        run_avg_yards=('run_yards', 'mean'),
+    )
+
+    tendencies = {}
+    for key, row in agg.iterrows():
+        pass_count = row['pass_count']
+        run_count = row['run_count']
+        pass_run_total = pass_count + run_count
+
+        if row['total'] == 0 or pass_run_total == 0:
+            continue
+
+        avg_yards = row['avg_yards']
+        pass_avg_yards = row['pass_avg_yards']
+        run_avg_yards = row['run_avg_yards']
+
+        tendencies[key] = {
+            'sampleSize': int(pass_run_total),
+            'passRate': round(pass_count / pass_run_total, 3),
+            'runRate': round(run_count / pass_run_total, 3),
+            'passLeft': round(row['pass_left'] / pass_count, 3) if pass_count > 0 else 0,
+            'passMiddle': round(row['pass_mid'] / pass_count, 3) if pass_count > 0 else 0,
+            'passRight': round(row['pass_right'] / pass_count, 3) if pass_count > 0 else 0,
+            'shotgunRate': round(row['shotgun'] / pass_run_total, 3),
+            'avgYards': round(avg_yards, 1) if pd.notna(avg_yards) else 0,
+            'passAvgYards': round(pass_avg_yards, 1) if pd.notna(pass_avg_yards) else 0,
+            'runAvgYards': round(run_avg_yards, 1) if pd.notna(run_avg_yards) else 0,
+        }
+
+    return tendencies
 
 def main():
     print("Loading 2025 play-by-play data...")
@@ -67,16 +95,27 @@ def main():
     regular_plays = team_plays[team_plays['play_type'].isin(['pass', 'run'])]
     print(f"Pass/Run plays: {len(regular_plays)}")
 
+    plays = add_tendency_columns(regular_plays)
+    third_down = plays[plays['down'] == 3]
+
+    # One groupby per breakdown, covering every team at once
+    overall = compute_tendencies(plays, 'posteam')
+    by_down = compute_tendencies(plays, ['posteam', 'down'])
+    by_distance = compute_tendencies(plays, ['posteam', 'distance_bucket'])
+    by_formation = compute_tendencies(plays, ['posteam', 'formation_bucket'])
+    third_overall = compute_tendencies(third_down, 'posteam')
+    third_by_distance = compute_tendencies(third_down, ['posteam', 'distance_bucket'])
+    team_counts = plays['posteam'].value_counts()
+
     output = {}
 
     for team in teams:
-        team_df = regular_plays[regular_plays['posteam'] == team]
-        print(f"\n{team}: {len(team_df)} plays")
+        print(f"\n{team}: {team_counts.get(team, 0)} plays")
 
         team_data = {
             'team': team,
-            'totalPlays': len(team_df),
-            'overall': compute_tendencies(team_df),
+            'totalPlays': int(team_counts.get(team, 0)),
+            'overall': overall.get(team),
             'byDown': {},
             'byDistance': {},
             'byFormation': {},
@@ -84,44 +123,31 @@ def main():
 
         # By down
         for down in [1, 2, 3, 4]:
-            down_plays = team_df[team_df['down'] == down]
-            tendencies = compute_tendencies(down_plays)
-            if tendencies:
-                team_data['byDown'][str(down)] = tendencies
+            if (team, down) in by_down:
+                team_data['byDown'][str(down)] = by_down[(team, down)]
 
         # By distance (short: 1-3, medium: 4-7, long: 8+)
-        short = team_df[(team_df['ydstogo'] >= 1) & (team_df['ydstogo'] <= 3)]
-        medium = team_df[(team_df['ydstogo'] >= 4) & (team_df['ydstogo'] <= 7)]
-        long_dist = team_df[team_df['ydstogo'] >= 8]
-
-        for name, plays in [('short', short), ('medium', medium), ('long', long_dist)]:
-            tendencies = compute_tendencies(plays)
-            if tendencies:
-                team_data['byDistance'][name] = tendencies
+        for name in ['short', 'medium', 'long']:
+            if (team, name) in by_distance:
+                team_data['byDistance'][name] = by_distance[(team, name)]
 
         # By formation (shotgun vs under center)
-        shotgun = team_df[team_df['shotgun'] == 1]
-        under_center = team_df[team_df['shotgun'] == 0]
-
-        for name, plays in [('shotgun', shotgun), ('underCenter', under_center)]:
-            tendencies = compute_tendencies(plays)
-            if tendencies:
-                team_data['byFormation'][name] = tendencies
+        for name in ['shotgun', 'underCenter']:
+            if (team, name) in by_formation:
+                team_data['byFormation'][name] = by_formation[(team, name)]
 
         # 3rd down specific (the money situation)
-        third_down = team_df[team_df['down'] == 3]
         team_data['thirdDown'] = {
-            'overall': compute_tendencies(third_down),
-            'short': compute_tendencies(third_down[(third_down['ydstogo'] >= 1) & (third_down['ydstogo'] <= 3)]),
-            'medium': compute_tendencies(third_down[(third_down['ydstogo'] >= 4) & (third_down['ydstogo'] <= 7)]),
-            'long': compute_tendencies(third_down[third_down['ydstogo'] >= 8]),
+            'overall': third_overall.get(team),
+            'short': third_by_distance.get((team, 'short')),
+            'medium': third_by_distance.get((team, 'medium')),
+            'long': third_by_distance.get((team, 'long')),
         }
 
         output[team] = team_data
 
-    # Write output
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(output, f, indent=2)
+    # Write output (compact; the browser fetches it on load)
+    OUTPUT_FILE.write_bytes(orjson.dumps(output, option=orjson.OPT_SERIALIZE_NUMPY))
 
     print(f"\nWrote {OUTPUT_FILE}")
     print(f"Size: {OUTPUT_FILE.stat().st_size / 1024:.1f} KB")
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """Create a compact dataset with ~50 plays for fast browser loading."""
 
-import json
+import gzip
+import orjson
 from pathlib import Path
 
 INPUT_FILE = Path(__file__).parent.parent / "src" / "data" / "plays.json"
@@ -9,8 +10,7 @@ OUTPUT_FILE = Path(__file__).parent.parent / "public" / "plays.json"
 
 def main():
     # Load full data
-    with open(INPUT_FILE) as f:
-        data = json.load(f)
+    data = orjson.loads(INPUT_FILE.read_bytes())
 
     # Take first 100 plays with reasonable frame counts
     good_plays = [p for p in data["plays"] if p["numFrames"] >= 10][:100]
@@ -18,22 +18,28 @@ def main():
     # Further optimize - reduce frame data
     for play in good_plays:
         for player in play["players"]:
-            # Keep only x, y for each frame
-            player["frames"] = [
-                {"f": fr["f"], "x": fr["x"], "y": fr["y"]}
-                for fr in player["frames"]
-            ]
+            # Keep only x, y for each frame, as [f, x*10, y*10] ints
+            # (0.1 yd resolution); the browser divides by 10 on load.
+            # Frames may be columnar ({"f": [...], ...}) or one dict per frame
+            frames = player["frames"]
+            if isinstance(frames, dict):
+                frames = zip(frames["f"], frames["x"], frames["y"])
+            else:
+                frames = ((fr["f"], fr["x"], fr["y"]) for fr in frames)
+            player["frames"] = [[f, round(x * 10), round(y * 10)] for f, x, y in frames]
 
     # Ensure output dir exists
     OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
 
-    # Write compact version
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump({"plays": good_plays}, f)
+    # Write compact version, plus a pre-compressed copy for static serving
+    data = orjson.dumps({"plays": good_plays})
+    OUTPUT_FILE.write_bytes(data)
+    gz_file = OUTPUT_FILE.with_name(OUTPUT_FILE.name + ".gz")
+    gz_file.write_bytes(gzip.compress(data, compresslevel=6))
 
     print(f"Created {OUTPUT_FILE}")
     print(f"Plays: {len(good_plays)}")
-    print(f"Size: {OUTPUT_FILE.stat().st_size / 1024:.1f} KB")
+    print(f"Size: {OUTPUT_FILE.stat().st_size / 1024:.1f} KB ({gz_file.stat().st_size / 1024:.1f} KB gzipped)")
 
     # Show sample info
     if good_plays:
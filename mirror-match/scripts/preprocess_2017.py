@@ -5,18 +5,116 @@ Full 22-player tracking + ball position.
 """
 
 import pandas as pd
-import json
+import numpy as np
+import orjson
+import os
+from multiprocessing import Pool
 from pathlib import Path
 
+from tracking_io import atomic_output, split_player_frames, write_gzip_copy
+
 DATA_DIR = Path(__file__).parent.parent / "nfl-data-2017" / "Data"
 OUTPUT_FILE = Path(__file__).parent.parent / "public" / "plays.json"
 
+def play_tasks(tracking, game_plays, position_by_id, home_team):
+    """
+    Split the game's tracking data into per-play tasks of plain values and
+    arrays: the play's row, its players' fields, its player frames sorted by
+    (player, frame), and its ball frames. Plays without tracking are skipped.
+    """
+    # Sort once by (play, ball after players, player, frame); each play's
+    # players and ball are then two consecutive slices
+    is_ball = (tracking['team'] == 'ball').to_numpy()
+    order = np.lexsort((tracking['frame.id'].to_numpy(), tracking['nflId'].to_numpy(),
+                        is_ball, tracking['playId'].to_numpy()))
+    tracking = tracking.iloc[order]
+    is_ball = is_ball[order]
+    play_ids = tracking['playId'].to_numpy()
+    columns = {'nflId': tracking['nflId'].to_numpy(), 'f': tracking['frame.id'].to_numpy(),
+               'x': tracking['x'].to_numpy(), 'y': tracking['y'].to_numpy()}
+    bounds = np.flatnonzero(np.diff(play_ids)) + 1
+    starts = [0, *bounds.tolist()]
+    ends = [*bounds.tolist(), len(play_ids)]
+    slices = {play_ids[start]: (start, end) for start, end in zip(starts, ends)}
+
+    # Each player's fields, from their first frame in the play
+    players = tracking[~is_ball].drop_duplicates(['playId', 'nflId'])
+    player_rows = {}
+    for row in players[['playId', 'nflId', 'displayName', 'jerseyNumber', 'team']].to_dict('records'):
+        nfl_id = int(row['nflId'])
+        player_rows.setdefault(row['playId'], []).append({
+            "nflId": nfl_id,
+            "name": row['displayName'],
+            "jersey": int(row['jerseyNumber']) if pd.notna(row['jerseyNumber']) else 0,
+            "team": row['team'],  # 'home' or 'away'
+            "position": position_by_id.get(nfl_id, 'UNK'),
+        })
+
+    for play_row in game_plays.to_dict('records'):
+        if play_row['playId'] not in slices:
+            continue
+        start, end = slices[play_row['playId']]
+        ball_start = start + int(np.count_nonzero(~is_ball[start:end]))
+        yield (play_row, player_rows.get(play_row['playId'], []),
+               {col: arr[start:ball_start] for col, arr in columns.items()},
+               {col: arr[ball_start:end] for col, arr in columns.items()},
+               home_team)
+
+def encode_play(task):
+    """Build and encode one play task in a worker."""
+    play_row, player_rows, player_columns, ball_columns, home_team = task
+    play_id = play_row['playId']
+
+    # Get unique frame IDs
+    frame_ids = np.union1d(player_columns['f'], ball_columns['f'])
+
+    # Build player frame columns: frames are sorted by (player, frame), so
+    # split at id boundaries, one list per field
+    player_frames = split_player_frames(
+        player_columns['nflId'],
+        {"f": player_columns['f'], "x": player_columns['x'], "y": player_columns['y']},
+        {"x": 1, "y": 1},
+    )
+    player_list = [{**player, "frames": frames} for player, frames in zip(player_rows, player_frames)]
+
+    # Build ball frame columns
+    ball_frames = {
+        "f": ball_columns['f'].tolist(),
+        "x": [round(x, 1) for x in ball_columns['x'].tolist()],
+        "y": [round(y, 1) for y in ball_columns['y'].tolist()],
+    }
+
+    # Determine which team has the ball
+    possession = play_row.get('possessionTeam', '')
+    is_home_offense = possession == home_team
+
+    play_entry = {
+        "gameId": play_row['gameId'],
+        "playId": play_id,
+        "quarter": int(play_row['quarter']) if pd.notna(play_row['quarter']) else 0,
+        "down": int(play_row['down']) if pd.notna(play_row['down']) else 0,
+        "yardsToGo": int(play_row['yardsToGo']) if pd.notna(play_row['yardsToGo']) else 0,
+        "possession": possession,
+        "formation": play_row.get('offenseFormation', '') if pd.notna(play_row.get('offenseFormation', '')) else '',
+        "personnel": play_row.get('personnel.offense', '') if pd.notna(play_row.get('personnel.offense', '')) else '',
+        "passResult": play_row.get('PassResult', '') if pd.notna(play_row.get('PassResult', '')) else '',
+        "passLength": play_row.get('PassLength', '') if pd.notna(play_row.get('PassLength', '')) else '',
+        "yardsGained": int(play_row['PlayResult']) if pd.notna(play_row.get('PlayResult')) else 0,
+        "description": play_row.get('playDescription', ''),
+        "numFrames": len(frame_ids),
+        "isHomeOffense": is_home_offense,
+        "players": player_list,
+        "ball": ball_frames
+    }
+
+    return orjson.dumps(play_entry, option=orjson.OPT_SERIALIZE_NUMPY)
+
 def main():
     print("Loading data...")
-    tracking = pd.read_csv(DATA_DIR / "tracking_gameId_2017090700.csv")
-    plays = pd.read_csv(DATA_DIR / "plays.csv")
-    players = pd.read_csv(DATA_DIR / "players.csv")
-    games = pd.read_csv(DATA_DIR / "games.csv")
+    tracking = pd.read_csv(DATA_DIR / "tracking_gameId_2017090700.csv", engine='pyarrow')
+    plays = pd.read_csv(DATA_DIR / "plays.csv", engine='pyarrow')
+    players = pd.read_csv(DATA_DIR / "players.csv", engine='pyarrow')
+    games = pd.read_csv(DATA_DIR / "games.csv", engine='pyarrow')
 
     # Get game info
     game = games[games['gameId'] == 2017090700].iloc[0]
@@ -26,107 +124,46 @@ def main():
     game_plays = plays[plays['gameId'] == 2017090700]
     print(f"Total plays: {len(game_plays)}")
 
-    # Build play data
-    all_plays = []
-
-    for _, play_row in game_plays.iterrows():
-        play_id = play_row['playId']
-        play_tracking = tracking[tracking['playId'] == play_id]
-
-        if len(play_tracking) == 0:
-            continue
-
-        # Separate ball and players
-        ball_data = play_tracking[play_tracking['team'] == 'ball']
-        player_data = play_tracking[play_tracking['team'] != 'ball']
-
-        # Get unique frame IDs
-        frame_ids = sorted(play_tracking['frame.id'].unique())
-
-        # Build player frame arrays
-        player_list = []
-        for nfl_id, p_df in player_data.groupby('nflId'):
-            p_df = p_df.sort_values('frame.id')
-            first_row = p_df.iloc[0]
-
-            # Get position from players table
-            player_info = players[players['nflId'] == nfl_id]
-            position = player_info['PositionAbbr'].iloc[0] if len(player_info) > 0 else 'UNK'
-
-            frames = []
-            for _, row in p_df.iterrows():
-                frames.append({
-                    "f": int(row['frame.id']),
-                    "x": round(row['x'], 1),
-                    "y": round(row['y'], 1),
-                })
-
-            player_list.append({
-                "nflId": int(nfl_id),
-                "name": first_row['displayName'],
-                "jersey": int(first_row['jerseyNumber']) if pd.notna(first_row['jerseyNumber']) else 0,
-                "team": first_row['team'],  # 'home' or 'away'
-                "position": position,
-                "frames": frames
-            })
-
-        # Build ball frame array
-        ball_frames = []
-        if len(ball_data) > 0:
-            ball_data = ball_data.sort_values('frame.id')
-            for _, row in ball_data.iterrows():
-                ball_frames.append({
-                    "f": int(row['frame.id']),
-                    "x": round(row['x'], 1),
-                    "y": round(row['y'], 1),
-                })
-
-        # Determine which team has the ball
-        possession = play_row.get('possessionTeam', '')
-        is_home_offense = possession == game['homeTeamAbbr']
-
-        play_entry = {
-            "gameId": int(play_row['gameId']),
-            "playId": int(play_id),
-            "quarter": int(play_row['quarter']) if pd.notna(play_row['quarter']) else 0,
-            "down": int(play_row['down']) if pd.notna(play_row['down']) else 0,
-            "yardsToGo": int(play_row['yardsToGo']) if pd.notna(play_row['yardsToGo']) else 0,
-            "possession": possession,
-            "formation": play_row.get('offenseFormation', '') if pd.notna(play_row.get('offenseFormation', '')) else '',
-            "personnel": play_row.get('personnel.offense', '') if pd.notna(play_row.get('personnel.offense', '')) else '',
-            "passResult": play_row.get('PassResult', '') if pd.notna(play_row.get('PassResult', '')) else '',
-            "passLength": play_row.get('PassLength', '') if pd.notna(play_row.get('PassLength', '')) else '',
-            "yardsGained": int(play_row['PlayResult']) if pd.notna(play_row.get('PlayResult')) else 0,
-            "description": play_row.get('playDescription', ''),
-            "numFrames": len(frame_ids),
-            "isHomeOffense": is_home_offense,
-            "players": player_list,
-            "ball": ball_frames
-        }
-
-        all_plays.append(play_entry)
-
-    print(f"Processed {len(all_plays)} plays with tracking data")
-
-    # Add game metadata
-    output = {
-        "game": {
-            "gameId": 2017090700,
-            "home": game['homeTeamAbbr'],  # NE
-            "away": game['visitorTeamAbbr'],  # KC
-            "homeScore": int(game['homeScore']) if 'homeScore' in game else 27,
-            "awayScore": int(game['awayScore']) if 'awayScore' in game else 42,
-        },
-        "plays": all_plays
+    # Game metadata
+    game_info = {
+        "gameId": 2017090700,
+        "home": game['homeTeamAbbr'],  # NE
+        "away": game['visitorTeamAbbr'],  # KC
+        "homeScore": game['homeScore'] if 'homeScore' in game else 27,
+        "awayScore": game['awayScore'] if 'awayScore' in game else 42,
     }
 
-    # Write output
+    # Build play data, streaming each play to disk as it's built
     OUTPUT_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(output, f)
-
+    num_plays = 0
+
+    # Stream into a temp file that replaces the output once every play is written
+    with atomic_output(OUTPUT_FILE) as f:
+        f.write(b'{"game":')
+        f.write(orjson.dumps(game_info, option=orjson.OPT_SERIALIZE_NUMPY))
+        f.write(b',"plays":[')
+
+        # Plays are independent, so they're built across a worker pool; each
+        # task carries only its own play's values and array slices
+        positions = players.drop_duplicates('nflId')
+        position_by_id = dict(zip(positions['nflId'].tolist(), positions['PositionAbbr'].tolist()))
+        tasks = play_tasks(tracking, game_plays, position_by_id, game['homeTeamAbbr'])
+        with Pool(processes=os.cpu_count()) as pool:
+            for play_bytes in pool.imap(encode_play, tasks, chunksize=8):
+                if num_plays:
+                    f.write(b',')
+                f.write(play_bytes)
+                num_plays += 1
+
+        f.write(b']}')
+
+    print(f"Processed {num_plays} plays with tracking data")
     print(f"Wrote {OUTPUT_FILE}")
     print(f"Size: {OUTPUT_FILE.stat().st_size / 1024:.1f} KB")
 
+    # Pre-compressed copy for static serving with Content-Encoding: gzip
+    gz_file = write_gzip_copy(OUTPUT_FILE)
+    print(f"Wrote {gz_file} ({gz_file.stat().st_size / 1024:.1f} KB)")
+
 if __name__ == "__main__":
     main()
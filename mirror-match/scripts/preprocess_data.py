@@ -5,10 +5,15 @@ Converts CSV tracking data into a compact format for browser visualization.
 """
 
 import pandas as pd
-import json
+import numpy as np
+import orjson
 import os
+from multiprocessing import Pool
 from pathlib import Path
 
+from tracking_io import (INPUT_COLUMNS, OUTPUT_COLUMNS, atomic_output, read_tracking,
+                         split_player_frames)
+
 # Paths
 DATA_DIR = Path(__file__).parent.parent / "nfl-big-data-bowl-2026-prediction" / "train"
 OUTPUT_DIR = Path(__file__).parent.parent / "src" / "data"
@@ -22,35 +27,65 @@ def load_week_data(week_num):
         return None, None
 
     print(f"Loading week {week_num}...")
-    input_df = pd.read_csv(input_file)
-    output_df = pd.read_csv(output_file) if output_file.exists() else None
+    input_df = read_tracking(input_file, INPUT_COLUMNS)
+    output_df = None
+    if output_file.exists():
+        output_df = read_tracking(output_file, OUTPUT_COLUMNS)
 
     return input_df, output_df
 
-def process_play(play_df):
+# Per-row columns a play's frames are built from, and the play- and
+# player-level fields taken from their first row
+FRAME_COLUMNS = ['nfl_id', 'frame_id', 'x', 'y', 's', 'dir']
+PLAY_COLUMNS = ['game_id', 'play_id', 'play_direction', 'absolute_yardline_number',
+                'ball_land_x', 'ball_land_y', 'num_frames_output']
+PLAYER_COLUMNS = ['nfl_id', 'player_name', 'player_position', 'player_side', 'player_role']
+
+def play_tasks(input_df):
+    """
+    Split a week's tracking data into per-play tasks of plain values and arrays:
+    the play's first-row fields, its players' fields, and its frame columns
+    sorted by (player, frame).
+    """
+    keys = ['game_id', 'play_id']
+    play_rows = input_df.drop_duplicates(keys).sort_values(keys)[PLAY_COLUMNS].to_dict('records')
+    players = input_df.drop_duplicates(keys + ['nfl_id']).sort_values(keys + ['nfl_id'])
+    player_counts = players.groupby(keys).size().tolist()
+    player_rows = players[PLAYER_COLUMNS].to_dict('records')
+
+    # Sort every row once by (game, play, player, frame); each play is then one slice
+    order = np.lexsort((input_df['frame_id'].to_numpy(), input_df['nfl_id'].to_numpy(),
+                        input_df['play_id'].to_numpy(), input_df['game_id'].to_numpy()))
+    game_ids = input_df['game_id'].to_numpy()[order]
+    play_ids = input_df['play_id'].to_numpy()[order]
+    columns = {col: input_df[col].to_numpy()[order] for col in FRAME_COLUMNS}
+    bounds = np.flatnonzero((np.diff(game_ids) != 0) | (np.diff(play_ids) != 0)) + 1
+    starts = [0, *bounds.tolist()]
+    ends = [*bounds.tolist(), len(game_ids)]
+
+    first_player = 0
+    for play_row, num_players, start, end in zip(play_rows, player_counts, starts, ends):
+        yield (play_row, player_rows[first_player:first_player + num_players],
+               {col: arr[start:end] for col, arr in columns.items()})
+        first_player += num_players
+
+def process_play(task):
     """Convert a single play's data into the format needed for visualization."""
-    # Get play metadata from first row
-    first_row = play_df.iloc[0]
+    first_row, player_rows, columns = task
 
-    # Group by player
-    players = []
-    for nfl_id, player_df in play_df.groupby('nfl_id'):
-        player_df = player_df.sort_values('frame_id')
-        first_player_row = player_df.iloc[0]
-
-        # Build frame array
-        frames = []
-        for _, row in player_df.iterrows():
-            frames.append({
-                "f": int(row['frame_id']),
-                "x": round(row['x'], 1),
-                "y": round(row['y'], 1),
-                "s": round(row['s'], 1) if pd.notna(row['s']) else 0,
-                "d": round(row['dir'], 0) if pd.notna(row['dir']) else 0,
-            })
+    # Group by player: frames are sorted by (player, frame), so split at id
+    # boundaries into frame columns, one list per field
+    player_frames = split_player_frames(
+        columns['nfl_id'],
+        {"f": columns['frame_id'], "x": columns['x'], "y": columns['y'],
+         "s": columns['s'], "d": columns['dir']},
+        {"x": 1, "y": 1, "s": 1, "d": 0},
+    )
 
+    players = []
+    for frames, first_player_row in zip(player_frames, player_rows):
         players.append({
-            "nflId": int(nfl_id),
+            "nflId": first_player_row['nfl_id'],
             "name": first_player_row['player_name'],
             "position": first_player_row['player_position'],
             "side": first_player_row['player_side'],
@@ -59,55 +94,68 @@ def process_play(play_df):
         })
 
     return {
-        "gameId": int(first_row['game_id']),
-        "playId": int(first_row['play_id']),
+        "gameId": first_row['game_id'],
+        "playId": first_row['play_id'],
         "direction": first_row['play_direction'],
-        "yardline": int(first_row['absolute_yardline_number']),
+        "yardline": first_row['absolute_yardline_number'],
         "ballLandX": round(first_row['ball_land_x'], 1) if pd.notna(first_row['ball_land_x']) else None,
         "ballLandY": round(first_row['ball_land_y'], 1) if pd.notna(first_row['ball_land_y']) else None,
-        "numFrames": int(first_row['num_frames_output']),
+        "numFrames": first_row['num_frames_output'],
         "players": players
     }
 
+def encode_play(task):
+    """Process and encode one play task in a worker; None if it fails."""
+    try:
+        return orjson.dumps(process_play(task), option=orjson.OPT_SERIALIZE_NUMPY)
+    except Exception as e:
+        print(f"Error processing play {task[0]['game_id']}/{task[0]['play_id']}: {e}")
+        return None
+
 def main():
     # Create output directory
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    all_plays = []
-
-    # Process weeks 1-3 for now (enough data for demo)
-    for week in range(1, 4):
-        input_df, output_df = load_week_data(week)
-        if input_df is None:
-            continue
+    # Stream plays to disk as they're processed; only the sample is kept in memory.
+    # The output file is only replaced once every play has been written
+    output_file = OUTPUT_DIR / "plays.json"
+    sample_plays = []
+    total_plays = 0
 
-        # Get unique plays
-        play_groups = input_df.groupby(['game_id', 'play_id'])
+    # Plays are independent, so they're processed across a worker pool
+    with Pool(processes=os.cpu_count()) as pool, atomic_output(output_file) as f:
+        f.write(b'{"plays":[')
 
-        for (game_id, play_id), play_df in play_groups:
-            try:
-                play_data = process_play(play_df)
-                all_plays.append(play_data)
-            except Exception as e:
-                print(f"Error processing play {game_id}/{play_id}: {e}")
+        # Process weeks 1-3 for now (enough data for demo)
+        for week in range(1, 4):
+            input_df, output_df = load_week_data(week)
+            if input_df is None:
                 continue
 
-        print(f"Week {week}: processed {len(play_groups)} plays")
+            # Workers get each play's own values and array slices, never DataFrames
+            week_plays = 0
+            for play_bytes in pool.imap(encode_play, play_tasks(input_df), chunksize=8):
+                week_plays += 1
+                if play_bytes is None:
+                    continue
 
-    print(f"\nTotal plays: {len(all_plays)}")
+                if total_plays:
+                    f.write(b',')
+                f.write(play_bytes)
+                total_plays += 1
+                if len(sample_plays) < 20:
+                    sample_plays.append(orjson.loads(play_bytes))
 
-    # Write output
-    output_file = OUTPUT_DIR / "plays.json"
-    with open(output_file, 'w') as f:
-        json.dump({"plays": all_plays}, f)
+            print(f"Week {week}: processed {week_plays} plays")
+
+        f.write(b']}')
 
+    print(f"\nTotal plays: {total_plays}")
     print(f"Wrote {output_file} ({output_file.stat().st_size / 1024 / 1024:.1f} MB)")
 
     # Also create a smaller sample file for quick testing
-    sample_plays = all_plays[:20]
     sample_file = OUTPUT_DIR / "plays_sample.json"
-    with open(sample_file, 'w') as f:
-        json.dump({"plays": sample_plays}, f, indent=2)
+    sample_file.write_bytes(orjson.dumps({"plays": sample_plays}, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
 
     print(f"Wrote {sample_file} ({sample_file.stat().st_size / 1024:.1f} KB)")
 
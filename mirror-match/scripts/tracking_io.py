@@ -0,0 +1,103 @@
+"""
+Shared I/O for the preprocessing scripts: the BDB 2026 tracking columns the
+scripts use, their narrow dtypes, a Parquet cache kept next to each CSV,
+splitting a play's frames per player, and output files that are only
+replaced once fully written, with their pre-compressed copies.
+"""
+
+import gzip
+import shutil
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+# Only the tracking columns the scripts use, with narrow dtypes. Coordinates,
+# speed and direction stay float64: they're rounded to 0.1 on output, and
+# float32 would shift values like 33.35 across the rounding boundary
+INPUT_COLUMNS = ['game_id', 'play_id', 'nfl_id', 'frame_id', 'x', 'y', 's', 'dir',
+                 'player_name', 'player_position', 'player_side', 'player_role',
+                 'play_direction', 'absolute_yardline_number', 'ball_land_x', 'ball_land_y',
+                 'num_frames_output']
+OUTPUT_COLUMNS = ['game_id', 'play_id', 'nfl_id', 'frame_id', 'x', 'y']
+TRACKING_DTYPES = {
+    'game_id': 'int32', 'play_id': 'int32', 'nfl_id': 'int32', 'frame_id': 'int16',
+    'player_role': 'category', 'player_side': 'category', 'player_position': 'category',
+    'play_direction': 'category',
+}
+
+def ensure_parquet(csv_path):
+    """
+    Convert a CSV to a sibling snappy Parquet file once (and when the CSV
+    changes). Returns None if the cache can't be written, e.g. when the data
+    directory is read-only.
+    """
+    pq_path = csv_path.with_suffix('.parquet')
+    if not pq_path.exists() or pq_path.stat().st_mtime < csv_path.stat().st_mtime:
+        print(f"Caching {csv_path.name} as Parquet...")
+        tmp_path = pq_path.with_suffix('.parquet.tmp')
+        try:
+            pq.write_table(pacsv.read_csv(csv_path), tmp_path, compression='snappy')
+            tmp_path.replace(pq_path)
+        except OSError as e:
+            print(f"Can't cache {csv_path.name} ({e}); reading the CSV directly")
+            return None
+        finally:
+            # Don't leave a partial file behind if the conversion is interrupted
+            if tmp_path.exists():
+                tmp_path.unlink()
+    return pq_path
+
+@contextmanager
+def atomic_output(path):
+    """
+    Open a sibling .tmp file for binary writing, and move it over path only
+    once the block completes, so a failed run leaves the last good output.
+    """
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        with open(tmp_path, 'wb') as f:
+            yield f
+        tmp_path.replace(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+def write_gzip_copy(path):
+    """Write path.gz next to path, for static serving with Content-Encoding: gzip."""
+    gz_path = path.with_name(path.name + '.gz')
+    with open(path, 'rb') as src, atomic_output(gz_path) as raw, \
+            gzip.GzipFile(path.name, 'wb', compresslevel=6, fileobj=raw) as dst:
+        shutil.copyfileobj(src, dst)
+    return gz_path
+
+def split_player_frames(player_ids, columns, decimals):
+    """
+    Split a play's frame columns, sorted by (player, frame), into one columnar
+    frames dict per player. Columns named in decimals are rounded to that many
+    places with the builtin round(), with missing values written as 0.
+    """
+    bounds = np.flatnonzero(np.diff(player_ids)) + 1
+    starts = [0, *bounds.tolist()]
+    ends = [*bounds.tolist(), len(player_ids)]
+
+    # Round each column once for the whole play; players get slices of them
+    lists = {}
+    for key, values in columns.items():
+        values = values.tolist()
+        if key in decimals:
+            values = [round(v, decimals[key]) if pd.notna(v) else 0 for v in values]
+        lists[key] = values
+
+    return [{key: values[start:end] for key, values in lists.items()}
+            for start, end in zip(starts, ends)]
+
+def read_tracking(csv_path, columns):
+    """Read tracking columns through the Parquet cache, with narrow dtypes."""
+    pq_path = ensure_parquet(csv_path)
+    if pq_path is None:
+        df = pd.read_csv(csv_path, usecols=columns, engine='pyarrow')
+    else:
+        df = pd.read_parquet(pq_path, columns=columns)
+    return df.astype({col: dtype for col, dtype in TRACKING_DTYPES.items() if col in df})
@@ -4,6 +4,17 @@ import ChatInterface from './components/ChatInterface';
 import { filterPlays, computeTendencies, getRepresentativePlay } from './engine/tendencyEngine';
 import './App.css';
 
+// Frames arrive either column-wise ({f: [...], x: [...], y: [...]}) or, in
+// compact data files, as [f, x*10, y*10]; expand both to {f, x, y} objects
+const decodeFrames = (frames = []) => {
+  if (!Array.isArray(frames)) {
+    const fields = Object.keys(frames);
+    return (frames.f || []).map((_, i) =>
+      Object.fromEntries(fields.map(key => [key, frames[key][i]])));
+  }
+  return frames.map(fr => (Array.isArray(fr) ? { f: fr[0], x: fr[1] / 10, y: fr[2] / 10 } : fr));
+};
+
 function App() {
   // All plays from data file
   const [allPlays, setAllPlays] = useState([]);
@@ -82,10 +93,12 @@ function App() {
         // Simple preprocessing
         const processedPlays = (playsData.plays || []).map(play => ({
           ...play,
+          ball: play.ball && decodeFrames(play.ball),
           offense: play.possession || awayTeam,
           defense: play.possession === homeTeam ? awayTeam : homeTeam,
           players: (play.players || []).map(player => ({
             ...player,
+            frames: decodeFrames(player.frames),
             team: player.team === 'home' ? homeTeam : player.team === 'away' ? awayTeam : player.team,
             side: (player.team === 'home' ? homeTeam : awayTeam) === play.possession ? 'Offense' : 'Defense',
             role: player.position === 'QB' ? 'Passer' : null,
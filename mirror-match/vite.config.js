@@ -1,7 +1,43 @@
+import fs from 'node:fs'
+import path from 'node:path'
 import { defineConfig } from 'vite'
 import react from '@vitejs/plugin-react'
 
+// Serve the data scripts' pre-compressed *.json.gz files with
+// Content-Encoding: gzip when the browser accepts it, unless the .json
+// has been rewritten since its .gz copy was made
+function precompressedJson() {
+  const mtime = (file) => fs.statSync(file, { throwIfNoEntry: false })?.mtimeMs
+
+  const serveFrom = (dir) => (req, res, next) => {
+    const url = req.url?.split('?')[0]
+    if (!url?.endsWith('.json') || !/\bgzip\b/.test(req.headers['accept-encoding'] || '')) return next()
+
+    const jsonPath = path.resolve(dir, `.${url}`)
+    const gzPath = `${jsonPath}.gz`
+    if (!jsonPath.startsWith(dir + path.sep)) return next()
+    const gzTime = mtime(gzPath)
+    const jsonTime = mtime(jsonPath)
+    if (gzTime === undefined || (jsonTime !== undefined && gzTime < jsonTime)) return next()
+
+    res.setHeader('Content-Type', 'application/json')
+    res.setHeader('Content-Encoding', 'gzip')
+    res.setHeader('Vary', 'Accept-Encoding')
+    fs.createReadStream(gzPath).pipe(res)
+  }
+
+  return {
+    name: 'precompressed-json',
+    configureServer(server) {
+      server.middlewares.use(serveFrom(path.resolve(server.config.publicDir)))
+    },
+    configurePreviewServer(server) {
+      server.middlewares.use(serveFrom(path.resolve(server.config.root, server.config.build.outDir)))
+    },
+  }
+}
+
 // https://vite.dev/config/
 export default defineConfig({
-  plugins: [react()],
+  plugins: [react(), precompressedJson()],
 })